@@ -184,13 +184,13 @@ class CommentBlock:
             
             # In the next statement, 3 is the length of " * " which will be the
             # comment leader.
-            outputs = MarkdownItem.output_all(
+            output = MarkdownItem.output_all(
                 self.markdownItems
                 , None if maxWidth is None
                 else maxWidth - (self.indentStart
                                  + (2 if self._swiftSource else 3)))
 
-            for index, line in enumerate(''.join(outputs).splitlines(True)):
+            for index, line in enumerate(output.splitlines(True)):
                 if index > 0 or self._swiftSource:
                     yield indentContinue
                     if not self._swiftSource:
@@ -202,7 +202,12 @@ class CommentBlock:
         yield "*/"
     
     def _process_at_paragraphs(self, maxWidth):
-        for item in self.markdownItems:
+        # Paragraphs that start with an at-command are replaced with new items,
+        # instead of being changed in place, because items cache their
+        # asTuple() return values. The list is copied first, in case it's
+        # shared.
+        self.markdownItems = list(self.markdownItems)
+        for index, item in enumerate(self.markdownItems):
             if item.blockType is not BlockType.PARAGRAPH:
                 continue
             content0 = item.contents[0]
@@ -215,12 +220,18 @@ class CommentBlock:
                             content0.content.__class__))
                 atPrefix, line = self._at_line(content0.contents)
                 if atPrefix is not None:
+                    custom = item.custom
                     if maxWidth is not None:
-                        if item.custom is not None:
+                        if custom is not None:
                             raise AssertionError(
                                 "Paragraph custom property in use.")
-                        item.custom = len(atPrefix)
-                    content0.contents = "".join((atPrefix, line))
+                        custom = len(atPrefix)
+                    self.markdownItems[index] = MarkdownItem(
+                        item.blockType, None, [
+                            MarkdownItem(
+                                None, SpanType.TEXT, "".join((atPrefix, line)))
+                            , *item.contents[1:]
+                        ], custom)
 
     def _at_line(self, line):
         message = " on line:\n{}\nin block {}".format(line, self.__repr__())
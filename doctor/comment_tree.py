@@ -305,22 +305,31 @@ class CommentTree:
 
     # Next methods access class properties with underscore names, which is a bit
     # naughty. ToDo: Fix it by maybe moving the REs into this file.
+    #
+    # The start and finish symbols are checked for as substrings first. That's
+    # much quicker than the regular expressions, and most lines have neither.
     @classmethod
     def _match_start(cls, element):
+        if '/**' not in element.text:
+            return None
         return cls._analyse_line(
-            element, SlashStarsParser._commentStart, 'start')
+            element, SlashStarsParser._commentStart.match, 'start')
     @classmethod
     def _match_continue(cls, element):
         return cls._analyse_line(
-            element, SlashStarsParser._commentContinue, 'continue')
+            element, SlashStarsParser._commentContinue.match, 'continue')
     @classmethod
     def _match_finish(cls, element):
+        if '*/' not in element.text:
+            return None
         return cls._analyse_line(
-            element, SlashStarsParser._commentFinish, 'finish')
+            element, SlashStarsParser._commentFinish.search, 'finish')
 
+    # The matchMethod parameter is the match() or search() method of a compiled
+    # regular expression, whichever the expression is written for.
     @classmethod
-    def _analyse_line(cls, element, regularExpression, commentPart):
-        match = regularExpression.search(element.text)
+    def _analyse_line(cls, element, matchMethod, commentPart):
+        match = matchMethod(element.text)
         if match is None:
             return None
         
@@ -388,10 +397,8 @@ class CommentTree:
                 f'Comment EOL pattern failed to match "{ET_string(parent)}"')
         
         parent[-1].tail = match.string[:match.start()]
-        eolElement = ET.Element('eol')
+        eolElement = ET.SubElement(parent, 'eol', {'extract': 'text'})
         eolElement.text = match.string[match.start():]
-        eolElement.set('extract', 'text')
-        parent.append(eolElement)
 
     @classmethod
     def comment_blocks(
@@ -409,8 +416,7 @@ class CommentTree:
                         'lineFirst': element.get('number')
                     })
                     ET_copy_attr(element, commentElement, 'source')
-                    linesElement = ET.Element(tagLines)
-                    commentElement.append(linesElement)
+                    linesElement = ET.SubElement(commentElement, tagLines)
 
                 linesElement.append(element)
                 endComment = commentPart == "finish"
@@ -544,9 +550,7 @@ class CommentTree:
                 if value is not None:
                     extraction.append(value)
             if extraction is not None:
-                extractElement = ET.Element(tag)
-                extractElement.text = ''.join(extraction)
-                element.append(extractElement)
+                ET.SubElement(element, tag).text = ''.join(extraction)
 
             yield element
 
@@ -830,17 +834,20 @@ class CommentTree:
                     if consolidated is None:
                         consolidated = child
                     else:
-                        # The removals list will be highest first.
-                        removals.insert(0, index)
+                        removals.append(index)
                         consolidated.text += child.text
                 else:
                     consolidated = None
             if len(removals) > 0:
                 # found.set('consolidated', str(removals))
                 found.set('consolidated', str([
-                    [removal, found[removal].text] for removal in removals]))
-                for index in removals:
-                    del found[index]
+                    [removal, found[removal].text]
+                    for removal in reversed(removals)]))
+                # Delete all the removals in one slice assignment.
+                removalSet = set(removals)
+                found[:] = [
+                    child for index, child in enumerate(found)
+                    if index not in removalSet]
 
     @classmethod
     def _strip_leading_newlines(cls, element):
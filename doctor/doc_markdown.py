@@ -393,25 +393,28 @@ class DocRenderer(mistune.Renderer):
         return []
 
 class DocInlineGrammar(mistune.InlineGrammar):
-    def __init__(self):
-        super().__init__()
-        # Mistune uses `match` not `search`, so it only consumes at the start.
-        # It might be possible to fix it. Might. For now, doc: URIs can only be
-        # at the start of a lexical doodad, or enclosed in brackets.
-        pattern = self.text.pattern.replace('https?', '(?:http|https|doc)')
-        self.text = re.compile(pattern)
+    # Mistune uses `match` not `search`, so it only consumes at the start.
+    # It might be possible to fix it. Might. For now, doc: URIs can only be
+    # at the start of a lexical doodad, or enclosed in brackets.
+    #
+    # The pattern is compiled once, when the class is defined. Mistune
+    # grammars have their patterns as class attributes too.
+    text = re.compile(mistune.InlineGrammar.text.pattern.replace(
+        'https?', '(?:http|https|doc)'))
 
 class DocInlineLexer(mistune.InlineLexer):
+    # Rule to add. Regular expressions here use the Python `r` raw string
+    # syntax.
+    docURI = re.compile(
+        r'(?:'
+        r'(?P<docBare>doc://\S*)'
+        r'|'
+        r'(\[)(\s*)(?P<docBrackets>doc://[^\]\s]*)(\s*)(\])'
+        r')'
+    )
+
     def enable_doc_uri(self):
-        # add rules. Regular expressions here use the Python `r` raw string
-        # syntax.
-        self.rules.doc_uri = re.compile(
-            r'(?:'
-            r'(?P<docBare>doc://\S*)'
-            r'|'
-            r'(\[)(\s*)(?P<docBrackets>doc://[^\]\s]*)(\s*)(\])'
-            r')'
-        )
+        self.rules.doc_uri = self.docURI
         self.default_rules.insert(1, 'doc_uri')
 
     def output_doc_uri(self, match):
@@ -94,6 +94,13 @@ class Doctor:
     def markers(self, markers):
         self._markers = markers
 
+    @property
+    def debug(self):
+        return self._debug
+    @debug.setter
+    def debug(self, debug):
+        self._debug = debug
+
     def load_cache(self, *paths):
         if self.injector is None:
             self.injector = getter.DocGetter()
@@ -122,10 +129,8 @@ class Doctor:
             extensionKey = (
                 "not checked" if reportOne.extension is None
                 else reportOne.extension[1:])
-            if extensionKey in report.extensionCounts:
-                report.extensionCounts[extensionKey] += 1
-            else:
-                report.extensionCounts[extensionKey] = 1
+            report.extensionCounts[extensionKey] = (
+                report.extensionCounts.get(extensionKey, 0) + 1)
             
             if reportOne.extension is None:
                 reportOne.extension = "not checked"
@@ -268,6 +273,7 @@ class Doctor:
         self._adHoc = False
         self._dryRun = False
         self._markers = False
+        self._debug = False
         self._extractDir = None
         self._extractMode = False
         
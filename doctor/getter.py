@@ -13,6 +13,11 @@ if __name__ == '__main__':
 #
 # Standard library imports, in alphabetic order.
 #
+# Module for caching the results of pure functions and properties.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+# https://docs.python.org/3/library/functools.html#functools.cached_property
+import functools
+#
 # Module for walking a directory and working with paths.
 # https://docs.python.org/3/library/os.html#os.walk
 # https://docs.python.org/3/library/os.path.html
@@ -29,6 +34,13 @@ from urllib.parse import urlparse
 # Module for XML handling.
 # https://docs.python.org/3.5/library/xml.etree.elementtree.html#module-xml.etree.ElementTree
 import xml.etree.ElementTree as ET
+#
+# Local imports
+#
+# Attribute values.
+from doctor.markdown_tree import ATTRIBUTE_FALSE, ATTRIBUTE_TRUE
+
+_UNRESOLVED_PATH = f".//*[@resolved='{ATTRIBUTE_FALSE}']"
 
 class DocGetter:
     def __init__(self):
@@ -41,14 +53,25 @@ class DocGetter:
             self.fragment = fragment
             self.contentLines = contentLines
         
+        # Path relative to the working directory, which is calculated the
+        # first time it's needed and then cached. The working directory doesn't
+        # change during a Doctor run.
+        @functools.cached_property
+        def relPath(self):
+            return os.path.relpath(self.absPath)
+
         @classmethod
         def read(cls, absPath):
             contentLines = None
             fragment = None
             with open(absPath) as docFile:
                 for line in docFile:
+                    # Check once per line for a top-level heading, which is
+                    # a line that starts with # but not with ##. Lines that
+                    # start with ## can't start a fragment anyway.
+                    heading = line[:1] == "#" and line[1:2] != "#"
                     if fragment is not None:
-                        if line.startswith("#") and not line.startswith("##"):
+                        if heading:
                             # Remove any EOL characters from the last line of
                             # content.
                             try:
@@ -62,7 +85,7 @@ class DocGetter:
                         else:
                             contentLines.append(line)
 
-                    if fragment is None and line.startswith("#"):
+                    if fragment is None and heading:
                         fragment = line[1:].strip()
                         if fragment == "" or fragment.startswith("#"):
                             fragment = None
@@ -81,15 +104,13 @@ class DocGetter:
         cache = self._get_content(element.get('uri'), sourceStr)
         element.set('contentLines', str(len(cache.contentLines)))
         element.set('content', ''.join(cache.contentLines))
-        return os.path.relpath(cache.absPath)
+        return cache.relPath
     
     def read(self, iterator, treeParser):
         for element in iterator:
             while True:
                 count = 0
-                for docOuter in element.findall(
-                    f".//*[@resolved='{str(False)}']"
-                ):
+                for docOuter in element.findall(_UNRESOLVED_PATH):
                     # Next line will:
                     #
                     # -   Resolve one level of the doc: uri, i.e. without
@@ -111,29 +132,18 @@ class DocGetter:
                     docOuter.extend(markdownInner[:])
 
                     count += 1
-                    docOuter.set('resolved', str(True))
+                    docOuter.set('resolved', ATTRIBUTE_TRUE)
 
                 if count == 0:
                     break
             yield element
 
     def _get_content(self, uri, basePath):
-        # Change backslash to forward slash in case this code gets run on a doc:
-        # uri written on a Windows machine. 
-        parsed = urlparse(uri.replace("\\", '/'))
-        if parsed.netloc in ('.', '..'):
-            path = os.path.dirname(os.path.abspath(basePath))
-            if parsed.netloc == '..':
-                path = os.path.join(path, os.path.pardir)
-        elif parsed.netloc == "":
-            path = None
-        else:
-            raise ValueError("Don't know how to get_content for"
-                             '{} "{}".'.format(parsed, basePath))
-        
-        path = (
-            None if path is None
-            else os.path.abspath(''.join((path, parsed.path))))
+        # The base path is made absolute and normalised here, so that the
+        # resolution cache, below, doesn't depend on the working directory and
+        # has one key for each base path.
+        absBase = None if basePath is None else os.path.abspath(basePath)
+        parsed, path = _resolve_path(uri, absBase)
         
         cached = None
         try:
@@ -179,3 +189,27 @@ class DocGetter:
                         cache.fragment, path))
             fragments.append(cache.fragment)
             self._cachedFiles.append(path)
+
+# The same doc: URI and base path pair can be resolved many times in a run, so
+# the results are cached. Resolution is only string manipulation, because the
+# base path will have been made absolute and normalised already, so caching is
+# safe.
+@functools.lru_cache(maxsize=None)
+def _resolve_path(uri, basePath):
+    # Change backslash to forward slash in case this code gets run on a doc:
+    # uri written on a Windows machine. 
+    parsed = urlparse(uri.replace("\\", '/'))
+    if parsed.netloc in ('.', '..'):
+        path = os.path.dirname(basePath)
+        if parsed.netloc == '..':
+            path = os.path.join(path, os.path.pardir)
+    elif parsed.netloc == "":
+        path = None
+    else:
+        raise ValueError("Don't know how to get_content for"
+                         '{} "{}".'.format(parsed, basePath))
+    
+    path = (
+        None if path is None
+        else os.path.abspath(''.join((path, parsed.path))))
+    return parsed, path
@@ -17,15 +17,15 @@ Run with Python 3 as follows.
 Set the MISTUNE environment variable to a path to add to the import paths to
 enable `import mistune`, or use the `-m PATH` command line switch, or
 use `-m ""` and set PYTHONPATH.
+
+Use the `--debug` switch to write the intermediate XML of each processing stage
+alongside the source file. Set the DOCTOR_DEBUG environment variable to any
+non-empty value to write diagnostic attributes that are costly to generate into
+the intermediate XML.
 """
 #
 # Standard library imports, in alphabetic order.
 # 
-# Module for command line switches.
-# Tutorial: https://docs.python.org/3/howto/argparse.html
-# Reference: https://docs.python.org/3/library/argparse.html
-import argparse
-#
 # JSON module.
 # https://docs.python.org/3/library/json.html
 import json
@@ -38,11 +38,6 @@ import os
 # Module for manipulation of the import path and other system access.
 # https://docs.python.org/3/library/sys.html
 import sys
-#
-# Module for text dedentation.
-# Only used for --help description.
-# https://docs.python.org/3/library/textwrap.html
-import textwrap
 
 # Local imports would go here, in alphabetic order.
 # The `doctor` module can't be imported unless mistune can also be imported.
@@ -84,20 +79,52 @@ Python module import, depending on the parameter value:
             os.path.dirname(__file__), *([os.path.pardir] * 2), 'mistune')
 
     path =  os.path.abspath(path)
-    if os.path.isdir(path):
-        filePath = os.path.join(path, 'mistune.py')
-        if not os.path.isfile(filePath):
-            sys.stderr.write(
-                "Warning: Directory for mistune import doesn't include"
-                ' expected file "{}".\n'.format(filePath))
-    else:
+    # One scan of the directory both checks that it is a directory and looks
+    # for the expected file. The found variable will be None if the path isn't
+    # a directory.
+    try:
+        with os.scandir(path) as entries:
+            found = any(
+                entry.name == 'mistune.py' and entry.is_file()
+                for entry in entries)
+    except PermissionError:
+        # The directory exists but can't be listed. It might still be possible
+        # to access the expected file, if the directory can be searched.
+        found = os.path.isfile(os.path.join(path, 'mistune.py'))
+    except OSError:
+        found = None
+
+    if found is None:
         sys.stderr.write("Warning: Path for mistune import isn't a directory"
                          ' "{}".\n'.format(path))
+    elif not found:
+        filePath = os.path.join(path, 'mistune.py')
+        sys.stderr.write(
+            "Warning: Directory for mistune import doesn't include"
+            ' expected file "{}".\n'.format(filePath))
     
-    sys.path.append(path)
+    # Don't add the path again if it's there already, for example if this
+    # subroutine gets called more than once. Duplicates would slow down every
+    # subsequent import.
+    if path not in sys.path:
+        sys.path.append(path)
     return path
 
 def main(prog, commandLine):
+    # These imports are only needed when the Doctor is run from the command
+    # line. The unit tests import this module for add_mistune_path() and don't
+    # need them.
+    #
+    # Module for command line switches.
+    # Tutorial: https://docs.python.org/3/howto/argparse.html
+    # Reference: https://docs.python.org/3/library/argparse.html
+    import argparse
+    #
+    # Module for text dedentation.
+    # Only used for --help description.
+    # https://docs.python.org/3/library/textwrap.html
+    import textwrap
+
     argumentParser = argparse.ArgumentParser(
         prog=prog,
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -127,6 +154,10 @@ def main(prog, commandLine):
     argumentParser.add_argument(
         '-k', '--markers', action='store_true', help=
         'leave <doc> markers where text was injected')
+    argumentParser.add_argument(
+        '--debug', action='store_true', help=
+        'write the intermediate XML of each processing stage to files alongside'
+        ' the source file')
     argumentParser.add_argument(
         '-o', '--overwrite', action='store_true', help=
         'overwrite the input files in place; default is a dry run')
@@ -166,20 +197,22 @@ def main(prog, commandLine):
     doctorJob.extractDir = arguments.extract_dir
     doctorJob.extractMode = arguments.extract
     doctorJob.markers = arguments.markers
+    doctorJob.debug = arguments.debug
     
     if arguments.inputs is None:
         argumentParser.error("At least one input must be specified.")
     
+    # Reports are serialised to a string and then written, because json.dump()
+    # would write to the stream in many small pieces.
     for report in doctorJob.overwrite_all(arguments.inputs):
         diffs = report['diffs']
         del report['diffs']
         if arguments.json:
-            json.dump(report, sys.stdout)
-            sys.stdout.write("\n")
+            sys.stdout.writelines((json.dumps(report), "\n"))
         if arguments.diffs and diffs is not None:
             sys.stdout.writelines(diffs)
-    json.dump(doctorJob.report, sys.stdout, indent=4)
-    sys.stdout.write("\n")
+    sys.stdout.writelines((json.dumps(doctorJob.report, indent=4), "\n"))
+    sys.stdout.flush()
     
     # Shell convention: return zero for OK.
     return 0
@@ -17,12 +17,54 @@ if __name__ == '__main__':
 # https://docs.python.org/3/library/enum.html
 import enum
 #
+# Module for caching the results of pure functions.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+import functools
+#
+# Module for in-memory text streams.
+# https://docs.python.org/3/library/io.html#io.StringIO
+import io
+#
+# Module for iterator building blocks.
+# https://docs.python.org/3/library/itertools.html#itertools.count
+import itertools
+#
 # Text wrapping module.
 # https://docs.python.org/3/library/textwrap.html
-from textwrap import wrap
+from textwrap import TextWrapper
 #
 # Local imports, in alphabetic order, would go here.
 
+# Header markers, indexed by level, and line breaks, indexed by count. Markdown
+# headers only have levels 1 to 6, and blocks are only ever followed by up to
+# two line breaks.
+_HASHES = ('', '#', '##', '###', '####', '#####', '######')
+_EOLS = ('', '\n', '\n\n')
+
+# List item markers, padded to the list indentation. Markers for ordered lists
+# that are longer than this get generated as needed.
+_ORDERED_MARKERS = tuple(f'{number}.'.ljust(4) for number in range(1, 100))
+_UNORDERED_MARKER = '-   '
+
+# Sentinel for the end of an iterator. It can't be None because None could be
+# an item in the iterator.
+_END = object()
+
+# There are only a few distinct wrapping widths and indents in a run, so the
+# wrapper objects are reused instead of being constructed for every paragraph.
+@functools.lru_cache(maxsize=64)
+def _wrapper(maxWidth, indent):
+    return TextWrapper(maxWidth, subsequent_indent=" " * indent)
+
+def _rewind(buffer, mark):
+    # Returns the lines written to the buffer after the mark, and removes them
+    # from the buffer so that they can be written again with changes.
+    buffer.seek(mark)
+    lines = buffer.read().splitlines(True)
+    buffer.seek(mark)
+    buffer.truncate()
+    return lines
+
 class BlockType(enum.Enum):
     #
     # Types from original Markdown, in the same order as here:
@@ -49,6 +91,7 @@ class SpanType(enum.Enum):
 class MarkdownItem:
     def __init__(self, blockType, spanType, contents, custom=None):
         # ToDo: Check consistent types and raise if not.
+        self._tuple = None
         self.blockType = blockType
         self.spanType = spanType
         self.contents = contents
@@ -58,103 +101,144 @@ class MarkdownItem:
     def type(self):
         return self.spanType if self.blockType is None else self.blockType
         
+    # The asTuple() return value is cached. Items aren't changed after they're
+    # constructed, so the cache never has to be cleared. Code that would change
+    # an item should construct a new one instead.
     def asTuple(self):
-        return (self.type.name,) + (
-            tuple() if self.custom is None else (self.custom,)
-        ) + (
-            (self.contents,) if isinstance(self.contents, str) else tuple(
-                content.asTuple() if isinstance(content, MarkdownItem)
-                else (content,)
-                for content in self.contents)
-        )
+        if self._tuple is None:
+            self._tuple = (self.type.name,) + (
+                tuple() if self.custom is None else (self.custom,)
+            ) + (
+                (self.contents,) if isinstance(self.contents, str) else tuple(
+                    content.asTuple() if isinstance(content, MarkdownItem)
+                    else (content,)
+                    for content in self.contents)
+            )
+        return self._tuple
     
     def __repr__(self):
         return self.asTuple().__repr__()
     
     def output(self, isLast=False, maxWidth=None):
-        if maxWidth is not None and maxWidth < 1:
-            maxWidth = 1
         if self.spanType is not None:
-            outputs = MarkdownItem.output_spans(self.contents)
-            if self.spanType is SpanType.EMPHASIS:
-                return outputs.join(('*',) * 2)
-            if self.spanType is SpanType.DOUBLE_EMPHASIS:
-                return outputs.join(('**',) * 2)
-            if self.spanType is SpanType.CODESPAN:
-                return outputs.join((r'`',) * 2)
-            if (self.spanType is SpanType.TEXT
-                or self.spanType is SpanType.INLINE_HTML
-                or self.spanType is SpanType.AUTOLINK
-            ):
-                return outputs
+            return self._span_output()
+        buffer = io.StringIO()
+        self._write(buffer, isLast, maxWidth)
+        return buffer.getvalue()
+    
+    def _span_output(self):
+        # Spans are output as plain strings. Only blocks are written into a
+        # buffer, see _write() below.
+        wrap = self._SPAN_WRAPS.get(self.spanType)
+        if wrap is None:
             raise NotImplementedError(str(self))
+        outputs = MarkdownItem.output_spans(self.contents)
+        return outputs.join((wrap,) * 2) if wrap else outputs
+
+    def _write(self, buffer, isLast, maxWidth):
+        # Writes block output directly into a buffer that is shared by the whole
+        # recursion, instead of returning strings that get joined at every
+        # level.
+        if self.spanType is not None:
+            buffer.write(self._span_output())
+            return
+        if maxWidth is not None and maxWidth < 1:
+            maxWidth = 1
         
-        outputs = None
-        eols = 2
-        if self.blockType is BlockType.HEADER:
-            outputs = ["#" * self.custom['level'], " "
-                       # No maxWidth for headers.
-                       , MarkdownItem.output_spans(self.contents)]
-            eols = 1
-        
-        if self.blockType is BlockType.PARAGRAPH:
-            outputs = [MarkdownItem.output_spans(
-                self.contents, maxWidth, self.custom)]
-
-        if self.blockType is BlockType.LIST:
-            childOutputs = MarkdownItem.output_all(self.contents, maxWidth)
-            outputs = []
-            for index, childOutput in enumerate(childOutputs):
-                outputs.extend((
-                    '{:<4}'.format(
-                        '{:d}.'.format(index + 1) if self.custom['ordered']
-                        else "-"),
-                    childOutput
-                ))
-        
-        if self.blockType is BlockType.LIST_ITEM:
-            childOutputs = MarkdownItem.output_all(
-                self.contents, maxWidth if maxWidth is None else maxWidth - 4)
-
-            outputs = []
-            # Indent every line except the first of each with four spaces. The
-            # LIST output, above, will indent the first line with whatever's
-            # suitable to the list type.
-            for index, line in enumerate(''.join(childOutputs).splitlines(True)):
-                outputs.extend(('    ' if index > 0 else '', line))
-
-            eols = 2 if self.contents[-1].type is BlockType.PARAGRAPH else 1
+        handler = self._BLOCK_DISPATCH.get(self.blockType)
+        if handler is None:
+            raise NotImplementedError(str(self))
+        eols = handler(self, buffer, maxWidth)
         
-        if self.blockType is BlockType.BLOCK_CODE:
-            # No line-wrapping in a code block.
-            # Indent every line by four spaces.
-            outputs = [
-                ''.join(('    ', line)) for line in "".join(
-                    MarkdownItem.output_all(self.contents, None)
-                    ).splitlines(True)
-            ]
-            
-            # Mistune preserves any line breaks at the end of a code block, so
-            # don't add any here. Note that the line breaks would be unnecessary
-            # if the code block is at the end of a comment.
-            eols = 0
+        if not isLast:
+            buffer.write(_EOLS[eols])
 
-        if outputs is None:
-            raise NotImplementedError(str(self))
+    # Block output handlers. Each writes the block and returns the number of
+    # line breaks that should follow it, unless it's the last item.
+    def _write_header(self, buffer, maxWidth):
+        buffer.write(_HASHES[self.custom['level']])
+        buffer.write(" ")
+        # No maxWidth for headers.
+        buffer.write(MarkdownItem.output_spans(self.contents))
+        return 1
+    
+    def _write_paragraph(self, buffer, maxWidth):
+        buffer.write(MarkdownItem.output_spans(
+            self.contents, maxWidth, self.custom))
+        return 2
+
+    def _write_list(self, buffer, maxWidth):
+        markers = itertools.chain(_ORDERED_MARKERS, (
+            f'{number}.'.ljust(4)
+            for number in itertools.count(len(_ORDERED_MARKERS) + 1)
+        )) if self.custom['ordered'] else itertools.repeat(_UNORDERED_MARKER)
+        MarkdownItem._write_all(buffer, self.contents, maxWidth, markers)
+        return 2
+    
+    def _write_list_item(self, buffer, maxWidth):
+        mark = buffer.tell()
+        MarkdownItem._write_all(
+            buffer, self.contents,
+            maxWidth if maxWidth is None else maxWidth - 4)
+
+        # Indent every line except the first of each with four spaces. The
+        # LIST output, above, will indent the first line with whatever's
+        # suitable to the list type.
+        for index, line in enumerate(_rewind(buffer, mark)):
+            if index > 0:
+                buffer.write('    ')
+            buffer.write(line)
+
+        return 2 if self.contents[-1].type is BlockType.PARAGRAPH else 1
+    
+    def _write_block_code(self, buffer, maxWidth):
+        # No line-wrapping in a code block.
+        # Indent every line by four spaces.
+        mark = buffer.tell()
+        MarkdownItem._write_all(buffer, self.contents, None)
+        for line in _rewind(buffer, mark):
+            buffer.write('    ')
+            buffer.write(line)
         
-        return ''.join(outputs + ['' if isLast else "\n" * eols])
+        # Mistune preserves any line breaks at the end of a code block, so
+        # don't add any here. Note that the line breaks would be unnecessary
+        # if the code block is at the end of a comment.
+        return 0
 
+    # Dispatch tables for the above. Spans only need the wrapping text, which
+    # is empty for plain spans.
+    _BLOCK_DISPATCH = {
+        BlockType.HEADER: _write_header,
+        BlockType.PARAGRAPH: _write_paragraph,
+        BlockType.LIST: _write_list,
+        BlockType.LIST_ITEM: _write_list_item,
+        BlockType.BLOCK_CODE: _write_block_code
+    }
+    _SPAN_WRAPS = {
+        SpanType.EMPHASIS: '*',
+        SpanType.DOUBLE_EMPHASIS: '**',
+        SpanType.CODESPAN: r'`',
+        SpanType.TEXT: '',
+        SpanType.INLINE_HTML: '',
+        SpanType.AUTOLINK: ''
+    }
     
     # https://docs.python.org/3/library/functions.html#staticmethod
     @staticmethod
     def output_all(iterator, maxWidth=None):
+        buffer = io.StringIO()
+        MarkdownItem._write_all(buffer, iterator, maxWidth)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _write_all(buffer, iterator, maxWidth=None, prefixes=None):
+        # If prefixes is specified, the next value from it is written before
+        # each output. That's used to write list item markers.
         if maxWidth is not None and maxWidth < 1:
             maxWidth = 1
 
-        items = (iterator,) if isinstance(iterator, str) else tuple(iterator)
-        itemCount = len(items)
+        items = iter((iterator,) if isinstance(iterator, str) else iterator)
 
-        result = []
         spans = None
         
         # The code treats blocks and spans differently:
@@ -167,24 +251,33 @@ class MarkdownItem:
         #
         #     The accumulated spans are then output, by calling output_spans.
         #
-        for index, item in enumerate(items):
+        # The iterator is read one item ahead, so that the last item can be
+        # detected without first reading all the items into a tuple.
+        item = next(items, _END)
+        while item is not _END:
+            following = next(items, _END)
             if isinstance(item, MarkdownItem) and item.blockType is not None:
                 if spans is not None:
-                    result.append(''.join((
-                        MarkdownItem.output_spans(spans, maxWidth), "\n")))
+                    if prefixes is not None:
+                        buffer.write(next(prefixes))
+                    buffer.write(MarkdownItem.output_spans(spans, maxWidth))
+                    buffer.write("\n")
                     spans = None
-                    
-                result.append(item.output(index == itemCount - 1, maxWidth))
+                
+                if prefixes is not None:
+                    buffer.write(next(prefixes))
+                item._write(buffer, following is _END, maxWidth)
             
             else:
                 if spans is None:
                     spans = []
                 spans.append(item)
+            item = following
         
         if spans is not None:
-            result.append(MarkdownItem.output_spans(spans, maxWidth))
-
-        return result
+            if prefixes is not None:
+                buffer.write(next(prefixes))
+            buffer.write(MarkdownItem.output_spans(spans, maxWidth))
         
     @staticmethod
     def output_spans(iterator, maxWidth=None, subsequent_indent=None):
@@ -200,11 +293,12 @@ class MarkdownItem:
         # print('output_spans 0', maxWidth, outputs)
         
         # It's possible to get a leading line break, in some cases in which a
-        # doc: substitution was made. Remove these here.
-        try:
-            outputs[0] = outputs[0].lstrip("\r\n")
-        except IndexError:
-            pass
+        # doc: substitution was made. Remove these here. The first character
+        # is checked first so that there's no new string in the usual case.
+        if len(outputs) > 0:
+            first = outputs[0]
+            if first != "" and first[0] in "\r\n":
+                outputs[0] = first.lstrip("\r\n")
         
         joined = ''.join(outputs)
 
@@ -215,10 +309,8 @@ class MarkdownItem:
         joined = " ".join(joined.splitlines())
         
         # print('output_spans 2', maxWidth, joined.encode())
-        return "\n".join(wrap(
-            joined, maxWidth
-            , subsequent_indent=" " * (0 if subsequent_indent is None
-                                       else subsequent_indent)
-        ))
+        return "\n".join(_wrapper(
+            maxWidth, 0 if subsequent_indent is None else subsequent_indent
+        ).wrap(joined))
         # Near here the code has lost the original EOLs, which might have been
         # CR-LF. Worry about that later if necessary.
@@ -12,34 +12,61 @@ if __name__ == '__main__':
 
 # Standard library imports, in alphabetic order.
 #
+# Module for caching the results of pure functions.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+import functools
+#
+# Module for environment variables.
+# https://docs.python.org/3/library/os.html#os.environ
+import os
+#
+# Module for interning strings.
+# https://docs.python.org/3/library/sys.html#sys.intern
+import sys
+#
 # Module for XML handling.
 # https://docs.python.org/3.5/library/xml.etree.elementtree.html#module-xml.etree.ElementTree
 import xml.etree.ElementTree as ET
 
+# Values for true and false attributes. ElementTree attribute values are
+# strings, so these are set once here rather than by str() at every use. They're
+# interned so that they're the same objects as any 'True' and 'False' literals,
+# which makes equality comparisons into identity checks. Tag names and attribute
+# names in the Doctor are all literals, which Python interns already.
+ATTRIBUTE_TRUE = sys.intern(str(True))
+ATTRIBUTE_FALSE = sys.intern(str(False))
+
+# Diagnostic attributes that would need a subtree to be serialised are only
+# written if the DOCTOR_DEBUG environment variable is set.
+_DEBUG = __debug__ and bool(os.environ.get('DOCTOR_DEBUG'))
+
 # ElementTree utility functions.
 #
 def ET_string(element):
     return ET.tostring(element, encoding="unicode")
 def ET_copy_attr(source, destination, names=None):
+    attributes = source.attrib
     if names is None:
-        names = source.keys()
-    elif isinstance(names, str):
+        destination.attrib.update(attributes)
+        return source.keys()
+    if isinstance(names, str):
         names = [names]
-    for name in names:
-        value = source.get(name)
-        if value is not None:
-            destination.set(name, value)
+    destination.attrib.update({
+        name: attributes[name] for name in names if name in attributes})
     return names
 
 # ET_index does the same as this:
 #
 #     return parent.index(child)
 #
-# ET_index uses `is` comparison, which Element.index() might not.
+# ET_index has to find the child by identity, which Element.index() might not.
+# Element doesn't define any equality comparison, so the list index() method
+# effectively compares with `is`, and does the scan in C.
 def ET_index(parent, child, returnNone=False):
-    for index, check in enumerate(parent):
-        if check is child:
-            return index
+    try:
+        return parent[:].index(child)
+    except ValueError:
+        pass
     if returnNone:
         return None
     raise ValueError(
@@ -47,17 +74,25 @@ def ET_index(parent, child, returnNone=False):
         f'\nparent:{ET_string(parent)}\nchild:{ET_string(child)}'
     )
 
+# The paths for ET_grandparent are built once for each xpath. ElementTree caches
+# its compiled form of each path, keyed by the path string, so there's no need
+# to keep anything else.
+@functools.lru_cache(maxsize=64)
+def _grandparent_paths(xpath):
+    return f'.//{xpath}/../..', f'./*/{xpath}/..', f'./{xpath}'
+
 def ET_grandparent(element, xpath):
-    grandparent = element.find(f'.//{xpath}/../..')
+    grandparentPath, parentPath, childPath = _grandparent_paths(xpath)
+    grandparent = element.find(grandparentPath)
     if grandparent is None:
         return None, None, None
-    parent = grandparent.find(f'./*/{xpath}/..')
+    parent = grandparent.find(parentPath)
     if parent is None:
         raise AssertionError(
             "Grandparent but no parent"
             f'\ngrandparent:{ET_string(grandparent)}'
             f'\nxpath:"{xpath}')
-    child = parent.find(f'./{xpath}')
+    child = parent.find(childPath)
     if child is None:
         raise AssertionError(
             "Parent but no child"
@@ -65,19 +100,41 @@ def ET_grandparent(element, xpath):
             f'\nxpath:"{xpath}')
     return grandparent, parent, child
 
+# ET_grandparent_match returns the same as ET_grandparent but finds the child
+# with a predicate function instead of an XPath. The predicate is called with
+# each element, in document order, that has a grandparent under the element
+# until it returns True. ElementTree elements don't have parent references so
+# the walk keeps track of the parent and grandparent as it goes. Unlike XPath,
+# the walk stops as soon as the child is found.
+def ET_grandparent_match(element, predicate):
+    return _grandparent_match(None, element, predicate)
+
+def _grandparent_match(grandparent, parent, predicate):
+    for child in parent:
+        if grandparent is not None and predicate(child):
+            return grandparent, parent, child
+        found = _grandparent_match(parent, child, predicate)
+        if found[0] is not None:
+            return found
+    return None, None, None
+
 def lift_singles(
     iterator, tagRemove='paragraph', countAttribute='contentLines'
 ):
     # If there was exactly one line in the resolution, then destructure the
     # markdown parser's return value, i.e. remove the paragraph layer.
+    #
+    # Destructuring only changes the found element and its one child, so the
+    # candidates can all be listed in a single pass, before any changes.
     for element in iterator:
-        while True:
-            found = element.find(f".//*[@{countAttribute}='1']")
-            if found is None:
-                break
-
+        candidates = [
+            candidate for candidate in element.iter()
+            if candidate is not element
+            and candidate.get(countAttribute) == '1'
+        ]
+        for found in candidates:
             if len(found) == 0:
-                # Attribute must be set to stop it being found again.
+                # Attribute records the outcome, for diagnostic purposes.
                 found.set(countAttribute, 'zero')
                 continue
 
@@ -97,12 +154,14 @@ def lift_singles(
             child = found[0]
             found.remove(child)
             found.extend(child[:])
-            # Attribute must be set to stop it being found again.
             found.set(countAttribute, 'lifted')
-            found[0].set('liftedSingle', str(True))
+            found[0].set('liftedSingle', ATTRIBUTE_TRUE)
 
         yield element
 
+def _is_resolved(element):
+    return element.get('resolved') is not None
+
 def lift_trees(iterator, leaveMarkers):
     # insertIndex = None
     # insertParent = None
@@ -112,8 +171,8 @@ def lift_trees(iterator, leaveMarkers):
 
     for element in iterator:
         while True:
-            grandparent, parent, docElement = ET_grandparent(
-                element, '*[@resolved]')
+            grandparent, parent, docElement = ET_grandparent_match(
+                element, _is_resolved)
             if grandparent is None:
                 break
             parentIndex = ET_index(grandparent, parent)
@@ -193,75 +252,88 @@ def lift_trees(iterator, leaveMarkers):
             if docIndex == 0 and len(parent) == 0:
                 del grandparent[parentIndex]
 
-        found = element.find(".//paragraph//paragraph")
-        if found is not None:
-            raise AssertionError(
-                f'Nested paragraph: {ET_string(found)}'
-                f'\nunder:{ET_string(element)}')
+        # Integrity check, which is skipped if Python is run with the -O switch.
+        if __debug__:
+            found = element.find(".//paragraph//paragraph")
+            if found is not None:
+                raise AssertionError(
+                    f'Nested paragraph: {ET_string(found)}'
+                    f'\nunder:{ET_string(element)}')
 
         yield element
 
-def can_contain(parentElement, childElement):
-    layout = childElement.get('layout')
-    docURI = childElement.get('resolved') is not None
+# Lookup tables for can_contain. Pairs are parent tag and child tag. Any pair
+# that isn't in either table, and whose parent tag isn't list, is unknown.
+_SPAN_LAYOUTS = frozenset(('span', 'marker'))
+_LEAF_PARENTS = frozenset(('paragraph', 'header'))
+_CAN_CONTAIN = frozenset((
+    ('list_item', 'paragraph'), ('list_item', 'list'), ('list', 'list_item')))
+_CANNOT_CONTAIN = frozenset((('list_item', 'list_item'),))
 
+def can_contain(parentElement, childElement):
     # The renderer sets an attribute layout:span on all span elements.  
     # This module sets layout:marker on <doc> elements that it inserts.  
     # Span and marker items can be contained by anything. So can doc_uri
     # elements, which could be encountered if nested.
-    if layout == 'span' or layout == 'marker' or docURI:
+    if (
+        childElement.get('layout') in _SPAN_LAYOUTS
+        or childElement.get('resolved') is not None
+    ):
         return True
 
     parent = parentElement.tag
-    if parent == 'paragraph' or parent == 'header':
+    if parent in _LEAF_PARENTS:
         # Paragraphs and headers cannot contain any block type.
         return False
 
     child = childElement.tag
-    if parent == 'list_item':
-        if child == 'paragraph' or child == 'list':
-            return True
-        if child == parent:
-            return False
-
-    if parent == 'list':
-        return child == 'list_item'
+    pair = (parent, child)
+    if pair in _CAN_CONTAIN:
+        return True
+    if pair in _CANNOT_CONTAIN or parent == 'list':
+        return False
 
     raise NotImplementedError(
         f"Don't know if {parent} can or cannot contain {child}.")
     
 def set_newlines(iterator):
-    detector = 'setNewlines'
-    outcome = 'newlines'
     for element in iterator:
-        for found in element.findall(f'.//*[@{detector}]'):
-            # Find an immediate child with tag equal to the value of the
-            # detector.
-            found.set(outcome, str(
-                1 if found.find(f'./{found.get(detector)}') is None else 2
-            ))
+        for found in element.iter():
+            if found is not element and found.get('setNewlines') is not None:
+                # Find an immediate child with tag equal to the value of the
+                # setNewlines attribute. The value is a plain tag, which
+                # ElementTree finds in C without XPath.
+                found.set('newlines', '1' if found.find(
+                    found.get('setNewlines')) is None else '2')
         yield element
 
+def _is_splitter(element):
+    return element.get('splitter') == ATTRIBUTE_TRUE
+
 def resolve_splitters(iterator):
     for element in iterator:
         while True:
-            grandparent, parent, splitter = ET_grandparent(
-                element, f'*[@splitter="{str(True)}"]')
+            grandparent, parent, splitter = ET_grandparent_match(
+                element, _is_splitter)
             if grandparent is None:
                 break
-            splitter.set('splitter', str(False))
+            splitter.set('splitter', ATTRIBUTE_FALSE)
 
             parentIndex = ET_index(grandparent, parent)
             splitterIndex = ET_index(parent, splitter)
-            parent.set('split', f'{splitterIndex} {ET_string(splitter)}')
+            if _DEBUG:
+                previous = (splitter if splitterIndex == 0
+                            else parent[splitterIndex - 1])
+                parent.set('split', f'{splitterIndex} {ET_string(previous)}')
+            else:
+                parent.set('split', str(splitterIndex))
             if splitterIndex > 0:
-                parent.set(
-                    'split',
-                    f'{splitterIndex} {ET_string(parent[splitterIndex - 1])}')
                 splitParent = ET.Element(parent.tag)
                 splitParent.extend(parent[splitterIndex:])
                 splitParent.set('split', 'new')
                 ET_copy_attr(parent, splitParent, 'newlines')
+                # The moved children are copied and deleted as whole slices, so
+                # there's only one move of the children list each way.
                 del parent[splitterIndex:]
                 grandparent.insert(parentIndex + 1, splitParent)
         yield element
@@ -274,28 +346,36 @@ def join_texts(iterator):
     for element in iterator:
         # The XPath finds parent elements of text elements.
         for found in element.findall('.//text/..'):
+            # Go through the list start to finish. The first text element in
+            # each run is kept, and accumulates the texts of the run. Elements
+            # that are kept are added to a new list of children, which replaces
+            # the original in one slice assignment after the enumeration.
+            kept = []
             consolidated = None
+            texts = []
             removals = []
-            # Go through the list start to finish. Any element that should be
-            # consolidated with the previous element is added to the removals
-            # list. Removals are processed after, to avoid modifying the list in
-            # the middle of the enumeration.
             for index, child in enumerate(found):
+                if child.tag == 'text' and consolidated is not None:
+                    texts.append(child.text)
+                    removals.append([index, child.text])
+                    continue
+                if len(texts) > 1:
+                    consolidated.text = ''.join(texts)
                 if child.tag == 'text':
-                    if consolidated is None:
-                        consolidated = child
-                    else:
-                        # The removals list will be highest first.
-                        removals.insert(0, index)
-                        consolidated.text += child.text
+                    consolidated = child
+                    texts = [child.text]
                 else:
                     consolidated = None
+                    texts = []
+                kept.append(child)
+            if len(texts) > 1:
+                consolidated.text = ''.join(texts)
+
             if len(removals) > 0:
-                # found.set('consolidated', str(removals))
-                found.set('consolidated', str([
-                    [removal, found[removal].text] for removal in removals]))
-                for index in removals:
-                    del found[index]
+                # The diagnostic lists removals highest first.
+                removals.reverse()
+                found.set('consolidated', str(removals))
+                found[:] = kept
         yield element
 
 def strip_leading_newlines(iterator):
@@ -303,9 +383,14 @@ def strip_leading_newlines(iterator):
     #
     # It's possible to get a leading line break, in some cases in which a doc:
     # substitution was made. Remove these here.
+    #
+    # The paragraphs are found by iteration and the text by a plain tag, not by
+    # XPath. ElementTree does both of those in C.
     for element in iterator:
-        for paragraph in element.findall('.//paragraph/text/..'):
-            found = paragraph.find('./text')
+        for paragraph in element.iter('paragraph'):
+            if paragraph is element:
+                continue
+            found = paragraph.find('text')
             if found is None or found.text is None:
                 continue
             stripped = found.text.lstrip("\r\n")
@@ -11,6 +11,10 @@ if __name__ == '__main__':
     raise SystemExit(1)
 # Standard library imports, in alphabetic order.
 #
+# Module for caching the results of pure functions.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+import functools
+#
 # Regular expressions module.
 # https://docs.python.org/3/library/re.html
 import re
@@ -21,6 +25,9 @@ import xml.etree.ElementTree as ET
 #
 # Local imports
 #
+# Attribute values.
+from doctor.markdown_tree import ATTRIBUTE_FALSE, ATTRIBUTE_TRUE
+#
 # Markdown parser module.
 # https://github.com/lepture/mistune/tree/v1
 import mistune
@@ -29,81 +36,98 @@ import mistune
 # subroutine to do that in the main.py script.
 
 def split_elements(text, firstTag, regularExpression, tags, tailing=False):
-    elements = [ET.Element(firstTag)]
-    match = regularExpression.search(text)
-    matchedGroups = matched_groups(match)
-    transcript = []
-    if match is not None:
-        transcript.append(f"text:'{text}'")
-        transcript.append(f'groups:{",".join(matchedGroups)}')
-
-    texts = []
+    # Each match starts a segment of the text. A segment runs from the end of
+    # the last tagged group in the previous match to the end of the text. The
+    # elements of a segment are a lead element for any text before the match,
+    # then one for each tagged group, and its transcript is on its first
+    # element. The lead element is only created if there's text for it. The
+    # remaining text after the last match is an element without transcript.
+    #
+    # Matching continues from the end of each match, so the regular expression
+    # should end with a tagged group, and shouldn't have anchors or lookbehind.
+    elements = []
+    segment = None
+    texts = None
     # Local subroutine to append text to the end of either of the following.
     #
-    # -   Texts that will be joined to become the text of the first element.
+    # -   Texts that will be joined to become the text of the lead element of
+    #     the segment.
     # -   Tail of the current last element.
     def set_tail(tail):
-        if len(elements) == 1:
+        if len(segment) == 0:
             texts.append(tail)
         else:
             if tailing:
-                if elements[-1].tail is None:
-                    elements[-1].tail = tail
+                if segment[-1].tail is None:
+                    segment[-1].tail = tail
                 else:
                     raise AssertionError(
-                        f'Overwriting tail {ET.tostring(elements[-1])}'
+                        f'Overwriting tail {ET.tostring(segment[-1])}'
                         f' with "{tail}".')
             else:
-                elements.append(ET.Element(firstTag))
-                elements[-1].text = tail
+                segment.append(ET.Element(firstTag))
+                segment[-1].text = tail
 
     cursor = 0
-    for name in matchedGroups:
-        start, end = match.span(name)
-        transcript.append(f'{name}:{start},{end}')
-
-        tag = None
-        for namePrefix in tags:
-            if name.startswith(namePrefix):
-                tag = namePrefix
-                break
-        if tag is None:
-            # No elements for other capture groups. Don't advance the cursor
-            # nor add an element.
-            continue
-        
-        if start < cursor:
-            raise AssertionError()
-
-        # Consume the text before the start of the current group.
-        set_tail(text[cursor:start])
-
-        # Add an element for the text in the current group.
-        elements.append(ET.Element(tag))
-        if end > start:
-            elements[-1].text = text[start:end]
-        cursor = end
-
-    for element in elements:
-        element.set('layout', 'span')
+    for match in regularExpression.finditer(text):
+        offset = cursor
+        segment = []
+        texts = []
+        matchedGroups = matched_groups(match)
+        transcript = [
+            f"text:'{text[offset:]}'", f'groups:{",".join(matchedGroups)}']
+
+        for name in matchedGroups:
+            start, end = match.span(name)
+            transcript.append(f'{name}:{start - offset},{end - offset}')
+
+            tag = None
+            for namePrefix in tags:
+                if name.startswith(namePrefix):
+                    tag = namePrefix
+                    break
+            if tag is None:
+                # No elements for other capture groups. Don't advance the
+                # cursor nor add an element.
+                continue
+
+            if start < cursor:
+                raise AssertionError()
+
+            # Consume the text before the start of the current group.
+            set_tail(text[cursor:start])
+
+            # Add an element for the text in the current group.
+            segment.append(ET.Element(tag))
+            if end > start:
+                segment[-1].text = text[start:end]
+            cursor = end
+
+        finished = len(segment) == 0
+        if finished:
+            # No elements in this match. Add the remaining text to the tail and
+            # don't check for more matches.
+            set_tail(text[cursor:])
+
+        elementText = ''.join(texts)
+        if elementText != "":
+            lead = ET.Element(firstTag)
+            lead.text = elementText
+            segment.insert(0, lead)
+        for element in segment:
+            element.set('layout', 'span')
+        segment[0].set('transcript', ' '.join(transcript))
+        elements.extend(segment)
+
+        if finished:
+            return elements
 
     # Process any remaining unmatched text.
-    if len(elements) <= 1:
-        # No match. Add the remaining text to the tail.
-        set_tail(text[cursor:])
-    else:
-        # At least one match. Check the remaining text for more matches.
-        elements.extend(split_elements(
-            text[cursor:], firstTag, regularExpression, tags, tailing))
-
-    elementText = ''.join(texts)
-    if elementText == "":
-        del elements[0]
-    else:
-        elements[0].text = elementText
-    if len(transcript) > 0:
-        elements[0].set('transcript', ' '.join(transcript))
-    
+    if cursor < len(text):
+        element = ET.Element(firstTag, {'layout': 'span'})
+        element.text = text[cursor:]
+        elements.append(element)
+
     return elements
 
 def matched_groups(match):
@@ -113,19 +137,34 @@ def matched_groups(match):
     '''
     if match is None:
         return []
+    groupNames = _group_names(match.re)
+    #
+    # Shortcut for patterns with only one named group, like the at-command
+    # pattern that is matched against every text.
+    if len(groupNames) == 1:
+        return [] if match.group(groupNames[0]) is None else list(groupNames)
     #
     # Create a list of the names. This is a Python list comprehension with a
     # filtering if condition.
     matchedGroups = [
-        key for key, value in match.groupdict().items()
-        if value is not None]
+        name for name in groupNames if match.group(name) is not None]
     #
-    # Sort by position in the matched string.
-    def group_start(groupName):
-        return match.start(groupName)
-    matchedGroups.sort(key=group_start)
+    # Sort by position in the matched string. Definition order is usually
+    # start order already, but not if a named group is inside a lookahead or
+    # lookbehind assertion, or inside a repeated group. For example, the
+    # pattern (?:(?P<a>x)|(?P<b>y))+ matches "yx" with b before a. Sorting a
+    # list that's in order already is cheap, and the sort is stable.
+    if len(matchedGroups) > 1:
+        matchedGroups.sort(key=match.start)
     return matchedGroups
 
+# Names of the named capture groups in a pattern, in the order in which they're
+# defined.
+@functools.lru_cache(maxsize=None)
+def _group_names(pattern):
+    groupIndex = pattern.groupindex
+    return tuple(sorted(groupIndex, key=groupIndex.get))
+
 class TreeRenderer(mistune.Renderer):
     # _nsPrefix = ""
     # Empty for now but could be changed like "markdown:".
@@ -163,7 +202,7 @@ class TreeRenderer(mistune.Renderer):
         return self._rend('doc_uri', None, {
             'transcript': f'groups:{",".join(matchedGroups)}',
             'uri': match.group(matchedGroups[0]),
-            'resolved': str(False)
+            'resolved': ATTRIBUTE_FALSE
         })
     
     # def at_command(self, match):
@@ -285,35 +324,38 @@ class TreeRenderer(mistune.Renderer):
         return []
 
 class DocInlineGrammar(mistune.InlineGrammar):
-    def __init__(self):
-        super().__init__()
-        # Mistune uses `match` not `search`, so it only consumes at the start.
-        # It might be possible to fix it. Might. For now, doc: URIs can only be
-        # at the start of a lexical doodad, or enclosed in brackets.
-        #
-        # Mistune splits https URLs into separate text lexical items for some
-        # reason. Following line modifies the grammar to split doc: and http:
-        # URLs as well. This seems to be necessary in order to make the doc_uri
-        # work in the lexer, below, at least the docBare group. Maybe the
-        # docBrackets group works anyway because Mistune already treats square
-        # brackets as a separate lexical item. In other words, Mistune separates
-        # text at square brackets anyway, because Markdown uses square brackets,
-        # there's no need to modify the grammar to make doc: in brackets
-        # recognisable.
-        pattern = self.text.pattern.replace('https?', '(?:http|https|doc)')
-        self.text = re.compile(pattern)
+    # Mistune uses `match` not `search`, so it only consumes at the start.
+    # It might be possible to fix it. Might. For now, doc: URIs can only be
+    # at the start of a lexical doodad, or enclosed in brackets.
+    #
+    # Mistune splits https URLs into separate text lexical items for some
+    # reason. Following line modifies the grammar to split doc: and http:
+    # URLs as well. This seems to be necessary in order to make the doc_uri
+    # work in the lexer, below, at least the docBare group. Maybe the
+    # docBrackets group works anyway because Mistune already treats square
+    # brackets as a separate lexical item. In other words, Mistune separates
+    # text at square brackets anyway, because Markdown uses square brackets,
+    # there's no need to modify the grammar to make doc: in brackets
+    # recognisable.
+    #
+    # The pattern is compiled once, when the class is defined. Mistune
+    # grammars have their patterns as class attributes too.
+    text = re.compile(mistune.InlineGrammar.text.pattern.replace(
+        'https?', '(?:http|https|doc)'))
 
 class DocInlineLexer(mistune.InlineLexer):
+    # Rule to add. Regular expressions here use the Python `r` raw string
+    # syntax.
+    docURI = re.compile(
+        r'(?:'
+        r'(?P<docBare>doc://\S*)'
+        r'|'
+        r'(\[)(\s*)(?P<docBrackets>doc://[^\]\s]*)(\s*)(\])'
+        r')'
+    )
+
     def enable_doc_uri(self):
-        # add rules. Regular expressions here use the Python `r` raw string
-        # syntax.
-        self.rules.doc_uri = re.compile(
-            r'(?:'
-            r'(?P<docBare>doc://\S*)'
-            r'|'
-            r'(\[)(\s*)(?P<docBrackets>doc://[^\]\s]*)(\s*)(\])'
-            r')'
-        )
+        self.rules.doc_uri = self.docURI
         self.default_rules.insert(1, 'doc_uri')
 
     def output_doc_uri(self, match):
@@ -335,7 +377,7 @@ class TreeParser:
         element.extend(self._markdown(text))
 
         for atCommand in element.findall('.//at_command'):
-            atCommand.set('splitter', str(True))
+            atCommand.set('splitter', ATTRIBUTE_TRUE)
             atCommand.tag = 'text'
 
         return element
@@ -12,6 +12,10 @@ if __name__ == '__main__':
 
 # Standard library imports, in alphabetic order.
 #
+# Module for caching function results.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+import functools
+#
 # Module for OO path handling.
 # https://docs.python.org/3/library/pathlib.html
 from pathlib import Path
@@ -31,12 +35,15 @@ import xml.etree.ElementTree as ET
 # Local imports
 #
 # ElementTree utility methods.
-from doctor.markdown_tree import ET_copy_attr
+from doctor.markdown_tree import ATTRIBUTE_TRUE, ET_copy_attr, ET_string
 # Regular expression utility method.
 from doctor.mistree import matched_groups
 
 # Internal utility methods
 
+# Lower case true, for case-insensitive comparison of attribute values.
+_TRUE_LOWER = ATTRIBUTE_TRUE.lower()
+
 def _output(text, attributes=None, tag='output'):
     element = (
         ET.Element(tag) if attributes is None else
@@ -45,24 +52,65 @@ def _output(text, attributes=None, tag='output'):
         element.text = text
     return element
 
+# All the comments in a file have the same source, so this gets called with
+# the same value many times.
+@functools.lru_cache(maxsize=128)
+def _is_swift(source):
+    return Path(source).suffix.lower() == '.swift'
+
+# Prefixes for at-commands, keyed by group name in the OutputTree.atCommand
+# pattern and whether the source is Swift. Values are functions that take the
+# captured command and parameter name, and return the prefix.
+#
+# Xcode will highlight either keyword Returns or Parameter, if there is exactly
+# one space between the hyphen and the keyword.
+#
+# The returns at-command has special handling. The RE captures either @return
+# or @returns as just return. The table changes it to a consistent Returns, for
+# Swift, or @return otherwise.
+_AT_PREFIX = {
+    ('commandParameter', True): lambda value, name: f"- Parameter {name}: ",
+    ('commandParameter', False): lambda value, name: (
+        f"@{value.lower()} {name} "),
+    ('commandDrop', True): lambda value, name: "",
+    ('commandDrop', False): lambda value, name: f"@{value.lower()} ",
+    ('commandCapitalise', True): lambda value, name: (
+        f"- {value.capitalize()}: "),
+    ('commandCapitalise', False): lambda value, name: f"@{value.lower()} ",
+    ('commandReturn', True): lambda value, name: "- Returns: ",
+    ('commandReturn', False): lambda value, name: f"@{value.lower()} ",
+}
+
 def _layout_transition(lastLayout, element):
     # Insert a newline if the child type changes from span to block. Block
     # layout items have no `layout` attribute.
     layout = element.get('layout')
     if lastLayout == 'span' and layout is None:
-        return layout, _output(None, {'newlines': str(1)})
+        return layout, _output(None, {'newlines': '1'})
     if layout == 'marker':
         # Ignore markers for the purposes of detecting layout transition.
         return lastLayout, None
     return layout, None
 
+def _collapse_whitespace(text):
+    # Collapse any adjacent whitespace into a single space. This will catch
+    # \r\n or \n or "  ". Same as re.sub(r'\s+', ' ', text) but str.split()
+    # is quicker. It splits on the same whitespace characters as \s but drops
+    # leading and trailing whitespace, which has to be put back.
+    words = text.split()
+    if len(words) == 0:
+        return " " if len(text) > 0 else ""
+    return ''.join((
+        " " if text[0].isspace() else "",
+        " ".join(words),
+        " " if text[-1].isspace() else ""
+    ))
+
 def _text_outputs(element):
     if element.text is None:
         return
     if element.get('verbatim') is None:
-        # Collapse any adjacent whitespace into a single space. This will
-        # catch \r\n or \n or "  ".
-        yield _output(re.sub(r'\s+', ' ', element.text))
+        yield _output(_collapse_whitespace(element.text))
     else:
         return_ = _output(element.text)
         ET_copy_attr(element, return_, 'verbatim')
@@ -110,75 +158,104 @@ class OutputTree:
     def __init__(self, indentWidth=4, maxWidth=80):
         self._indentWidth = indentWidth
         self._maxWidth = maxWidth
+        # Indent attribute values, which are the same for every output.
+        self._indentStr = str(indentWidth)
+        self._outdentStr = str(0 - indentWidth)
+        # One wrapper is reused for all wrapping. Only its subsequent indent
+        # changes, and that's set before each use.
+        self._wrapper = textwrap.TextWrapper(
+            width=maxWidth, drop_whitespace=True)
 
     def markdown_outputs(
         self, iterator, tagMarkdown='markdown', tagOutputs='outputs'
     ):
         for element in iterator:
-            markdown = element.find(f'./{tagMarkdown}')
+            markdown = element.find(tagMarkdown)
             if markdown is not None:
-                outputs = ET.Element(tagOutputs)
-                outputs.extend(tuple(self._markdown_outputs(markdown)))
-                element.append(outputs)
+                ET.SubElement(element, tagOutputs).extend(
+                    self._markdown_outputs(markdown))
             yield element
 
     def _markdown_outputs(self, element):
+        # Depth-first traversal with an explicit stack, instead of recursion.
+        # Each stack frame is a tuple of: the element, an enumeration of its
+        # children, the index of its last child that isn't a doc marker, its
+        # ordered list setting, the layout of the previous child, and the
+        # current child, or None if no child has been entered yet.
+        outputs = []
+        stack = [self._markdown_enter(element, outputs)]
+        while stack:
+            (
+                element, children, lastIndex, ordered, lastLayout, current
+            ) = stack.pop()
+            if current is not None:
+                # Back from the current child, so close it off.
+                index, child = current
+                if ordered is not None:
+                    outputs.append(
+                        _output(None, {'indent': self._outdentStr}))
+
+                if index < lastIndex:
+                    newlinesStr = child.get('newlines')
+                    if newlinesStr is not None:
+                        outputs.append(
+                            _output(None, {'newlines': newlinesStr}))
+
+            current = next(children, None)
+            if current is None:
+                wrap = element.get('wrap')
+                if wrap is not None:
+                    outputs.append(_output(wrap))
+                continue
+
+            index, child = current
+            if ordered is not None:
+                listIndicator = (
+                    f'{index + 1 if ordered else ""}{"." if ordered else "-"}')
+                outputs.append(_output(
+                    f'{listIndicator:<{self._indentWidth}}'
+                    , {'indent': self._indentStr}
+                ))
+
+            lastLayout, transition = _layout_transition(lastLayout, child)
+            if transition is not None:
+                outputs.append(transition)
+
+            stack.append((
+                element, children, lastIndex, ordered, lastLayout, current))
+            stack.append(self._markdown_enter(child, outputs))
+        return outputs
+
+    def _markdown_enter(self, element, outputs):
+        # Appends the outputs that come before the element's children, and
+        # returns a new stack frame for _markdown_outputs().
         wrap = element.get('wrap')
         if wrap is not None:
-            yield _output(wrap)
+            outputs.append(_output(wrap))
 
         headerLevel = element.get('level')
         if headerLevel is not None:
-            for _ in range(int(headerLevel)):
-                yield _output('#')
-            yield _output(' ')
+            outputs.append(_output(''.join(('#' * int(headerLevel), ' '))))
 
         indent = element.get('verbatim') == 'block'
         for output in _text_outputs(element):
             if indent:
-                output.set('indentFixed', str(self._indentWidth))
-            yield output
+                output.set('indentFixed', self._indentStr)
+            outputs.append(output)
 
         lastIndex = len(element) - 1
         while lastIndex >= 0 and element[lastIndex].tag == 'doc':
             lastIndex -= 1
 
-        lastLayout = None
         ordered = element.get('ordered')
         if ordered is not None:
-            ordered = ordered.lower() == str(True).lower()
-        
-        for index, child in enumerate(element):
-            if ordered is not None:
-                listIndicator = (
-                    f'{index + 1 if ordered else ""}{"." if ordered else "-"}')
-                yield _output(
-                    f'{listIndicator:<{self._indentWidth}}'
-                    , {'indent': str(self._indentWidth)}
-                )
-
-            lastLayout, transition = _layout_transition(lastLayout, child)
-            if transition is not None:
-                yield transition
-
-            # Recursive call.
-            for output in self._markdown_outputs(child):
-                yield output
-
-            if ordered is not None:
-                yield _output(None, {'indent': str(0 - self._indentWidth)})
+            ordered = ordered.lower() == _TRUE_LOWER
 
-            if index < lastIndex:
-                newlinesStr = child.get('newlines')
-                if newlinesStr is not None:
-                    yield _output(None, {'newlines': newlinesStr})
-
-        if wrap is not None:
-            yield _output(wrap)
+        return element, enumerate(element), lastIndex, ordered, None, None
     
     def indent_outputs(self, iterator, tagOutputs='outputs'):
         for element in iterator:
-            found = element.find(f'./{tagOutputs}')
+            found = element.find(tagOutputs)
             if found is not None:
                 outputs = tuple(_indent_outputs(found))
                 found[:] = outputs
@@ -186,7 +263,7 @@ class OutputTree:
     
     def write_lines(self, iterator, writer, tagOutputs='outputs'):
         for element in iterator:
-            found = element.find(f'./{tagOutputs}')
+            found = element.find(tagOutputs)
             if found is None:
                 writer.write(element.text)
             else:
@@ -195,13 +272,13 @@ class OutputTree:
                     writer.write(output)
             yield element
 
-    def _comment_outputs(self, commentElement, iterator, tagOutputs='outputs'):
+    def _comment_outputs(self, commentElement, iterator):
         source = commentElement.get('source')
         if source is None:
             AssertionError(
                 "Comment doesn't have source attribute"
                 f' {ET_string(commentElement)}')
-        swift = Path(source).suffix.lower() == '.swift'
+        swift = _is_swift(source)
         indentStart = int(commentElement.get('indentStart'))
 
         indentContinue = indentStart + 1
@@ -215,10 +292,15 @@ class OutputTree:
             yield prefix
             prefix = None
 
-        outputs = []
+        # Subsequent indents for lines after the first, keyed by hanging width.
+        # They're the same for many lines in a comment so they're only built
+        # once each.
+        subsequents = {}
+        wrapper = self._wrapper
+
+        # The outputs are modified in place, by _at_command_hanging().
         for index, output in enumerate(iterator):
             hanging = self._at_command_hanging(output, swift)
-            outputs.append(output)
 
             if prefix is None:
                 prefix = lineStart
@@ -228,14 +310,26 @@ class OutputTree:
                 yield prefix
                 yield output.text
             else:
-                subsequent = ''.join((prefix, " " * hanging))
-                lines = textwrap.wrap(
-                    ''.join((prefix, output.text)),
-                    width=self._maxWidth,
-                    # initial_indent=prefix
-                    subsequent_indent=subsequent,
-                    drop_whitespace=True
-                )
+                if prefix is lineStart:
+                    subsequent = subsequents.get(hanging)
+                    if subsequent is None:
+                        subsequent = ''.join((lineStart, " " * hanging))
+                        subsequents[hanging] = subsequent
+                else:
+                    subsequent = ''.join((prefix, " " * hanging))
+                text = ''.join((prefix, output.text))
+                if (
+                    len(text) <= wrapper.width and text.isprintable()
+                    and not text.endswith(' ')
+                ):
+                    # Text that fits, and that has no whitespace for the
+                    # wrapper to replace or drop, would be returned unchanged.
+                    lines = [text]
+                else:
+                    # initial_indent isn't used, it's the default empty
+                    # string.
+                    wrapper.subsequent_indent = subsequent
+                    lines = wrapper.wrap(text)
                 if len(lines) == 0:
                     # If the input text is empty, wrap() throws away everything.
                     lines = [""]
@@ -252,9 +346,6 @@ class OutputTree:
             if output.get('bareLine') is None:
                 yield "\n"
             prefix = None
-        
-        found = commentElement.find(f'./{tagOutputs}')
-        found[:] = outputs
 
         if prefix is not None:
             yield prefix
@@ -268,7 +359,9 @@ class OutputTree:
         if hangingStr is None:
             return None
         hanging = int(hangingStr)
-        match = self.atCommand.match(element.text[hanging:])
+        # Matching from the hanging position means the text isn't sliced, and
+        # the match positions are in the whole text.
+        match = self.atCommand.match(element.text, hanging)
         if match is None:
             if element.text.startswith("@"):
                 warning = ET.Element('warning')
@@ -276,13 +369,12 @@ class OutputTree:
                 element.insert(0, warning)
             return hanging
 
-        if match.start() != 0:
+        if match.start() != hanging:
             raise AssertionError(
-                "At-command doesn't start at zero" f'\n{ET_string(element)}')
+                "At-command doesn't start at hanging indent"
+                f'\n{ET_string(element)}')
 
         # lineAfter = line[match.end():]
-        prefix = None
-
         matchedGroups = matched_groups(match)
         element.set('atGroups', matchedGroups)
         group = matchedGroups[0]
@@ -290,39 +382,19 @@ class OutputTree:
             raise AssertionError(
                 "Group name doesn't start with " f'"command": "{group}"'
                 f'\n{ET_string(element)}')
-        value = match.group(group)
-        lowered = f"@{value.lower()} "
-
-        # Xcode will highlight either keyword Returns or Parameter, if there is
-        # exactly one space between the hyphen and the keyword.
-        if group == 'commandParameter':
-            prefix = "".join((
-                "- Parameter " if swift else lowered,
-                match.group('name'),
-                ":" if swift else "",
-                " "
-            ))
-        elif group == 'commandDrop':
-            prefix = "" if swift else lowered
-        elif group == 'commandCapitalise':
-            prefix = (
-                f"- {value.capitalize()}: " if swift else lowered)
-        elif group == 'commandReturn':
-            # The returns at-command has special handling. The RE captures
-            # either @return or @returns as just return. The code here changes
-            # it to a consistent Returns, for Swift, or @return otherwise.
-            prefix = "- Returns: " if swift else lowered
-        elif group == 'commandIgnore':
+        if group == 'commandIgnore':
             return hanging
 
-        if prefix is None:
+        prefixer = _AT_PREFIX.get((group, swift))
+        if prefixer is None:
             raise AssertionError(
                 f'Matched at-command "{group}" not handled'
                 f'\n{ET_string(element)}')
+        prefix = prefixer(match.group(group), match.group('name'))
         element.set('atPrefix', prefix)
         
         element.text = ''.join((
-            element.text[:hanging], prefix, match.string[match.end():]
+            element.text[:hanging], prefix, element.text[match.end():]
         ))
 
         return hanging + len(prefix)
@@ -375,7 +447,7 @@ def _indent_outputs(iterator):
                 ):
                     # The bareLine must be set because splitLines(True)
                     # retains the eol characters.
-                    indentPrint = ET.Element(tag, {'bareLine': str(True)})
+                    indentPrint = ET.Element(tag, {'bareLine': ATTRIBUTE_TRUE})
                     ET_copy_attr(element, indentPrint, 'verbatim')
                     indentPrint.text = line
                     yield indentPrint
@@ -404,7 +476,7 @@ def _indent_outputs(iterator):
     if tag is not None and len(lineTexts) > 0:
         indentPrint = ET.Element(tag, {
             'hanging': str(hanging),
-            'bareLine': str(True)
+            'bareLine': ATTRIBUTE_TRUE
         })
         indentPrint.text = ''.join(lineTexts)
         yield indentPrint
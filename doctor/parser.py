@@ -38,11 +38,13 @@ Parser for /** style documentation comments.
     # -   (?P<name>...) for named capture groups.
     # -   (?:...) for non-capture groups.
     # -   Python string continuation with comments in between the strings.
+    # -   Not ^ to anchor because this and the comment start are used with the
+    #     .match() method so it's implicit.
     #
     _commentContinue = re.compile(
         # Indent. Uses a space, not \s, which is OK because expandtabs will
         # have been called on the string before matching.
-        r'^(?P<indent> *)'
+        r'(?P<indent> *)'
         # Group for matching one of a number of expressions.
         # The group isn't captured, which is specified by ?:
         r'(?:'
@@ -65,9 +67,9 @@ Parser for /** style documentation comments.
         r')'
     )
     #
-    # Comment start.
+    # Comment start, which must be used with the .match() method.
     _commentStart = re.compile(
-        r'^(?P<indent>\s*)(?P<symbol>/\*\*)(?P<margin> ?)'
+        r'(?P<indent>\s*)(?P<symbol>/\*\*)(?P<margin> ?)'
         r'(?:$|(?=[^/]))')
     # Second line in the above prevents matching /**/
     #
@@ -105,8 +107,13 @@ Parser for /** style documentation comments.
                 if verbose:
                     print(sourceLine)
 
+            # Substring checks are much quicker than the regular
+            # expressions, and most lines don't have a comment start or
+            # finish.
             if not inComment:
-                match = reader.commentStart.search(sourceLine.line)
+                match = (
+                    reader.commentStart.match(sourceLine.line)
+                    if '/**' in sourceLine.line else None)
                 if match is None:
                     if sourceLine.line != '':
                         yield sourceLine
@@ -135,7 +142,9 @@ Parser for /** style documentation comments.
             finishAnalysis = None
             finishLine = None
             if inComment:
-                match = reader.commentFinish.search(sourceLine.line)
+                match = (
+                    reader.commentFinish.search(sourceLine.line)
+                    if '*/' in sourceLine.line else None)
                 if match is not None:
                     finishLine = SourceLine(
                         sourceLine.lineNumber, sourceLine.line[match.end():])
@@ -149,7 +158,7 @@ Parser for /** style documentation comments.
                 if lineAnalysis is None:
                     match = (
                         None if sourceLine.line == ""
-                        else reader.commentContinue.search(sourceLine.line))
+                        else reader.commentContinue.match(sourceLine.line))
                     if match is None:
                         if finishAnalysis is None:
                             raise RuntimeError(" ".join((
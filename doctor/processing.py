@@ -20,6 +20,10 @@ from pathlib import Path
 # https://docs.python.org/3.5/library/xml.etree.elementtree.html#module-xml.etree.ElementTree
 import xml.etree.ElementTree as ET
 #
+# XML utility for quoting an attribute value.
+# https://docs.python.org/3/library/xml.sax.utils.html#xml.sax.saxutils.quoteattr
+from xml.sax.saxutils import quoteattr
+#
 # Local imports
 #
 # Modules in the Doctor package.
@@ -75,12 +79,14 @@ class Processing:
             pass
 
     def _report_tags(self, iterator, report=None):
+        if report is None:
+            return iterator
+        return self._count_tags(iterator, report)
+
+    def _count_tags(self, iterator, report):
+        reportGet = report.get
         for element in iterator:
-            if report is not None:
-                if element.tag in report:
-                    report[element.tag] += 1
-                else:
-                    report[element.tag] = 1
+            report[element.tag] = reportGet(element.tag, 0) + 1
             yield element
 
     def comments_to_extract(
@@ -103,16 +109,24 @@ class Processing:
                 writer.writelines(element.text)
 
     def _write_xml(self, iterator, basePath, stemSuffix):
-        root = ET.Element('file', {'path': str(basePath)})
-        root.extend(tuple(iterator))
-        document = ET.ElementTree(root)
+        if not self._job.debug:
+            return iterator
+        return self._tee_write(iterator, basePath, stemSuffix)
+
+    def _tee_write(self, iterator, basePath, stemSuffix):
+        # Each element is serialised as it passes through, instead of after the
+        # pipeline has been drained, because later stages modify the elements
+        # in place.
         xmlPath = basePath.with_suffix('.xml')
         path = xmlPath.with_name(''.join((
             xmlPath.stem, stemSuffix, xmlPath.suffix)))
         # print(f'Writing "{str(path)}".')
         with path.open('w') as file:
-            document.write(file, encoding="unicode")
-        return root
+            file.writelines(('<file path=', quoteattr(str(basePath)), '>'))
+            for element in iterator:
+                file.write(ET.tostring(element, encoding="unicode"))
+                yield element
+            file.write('</file>')
     
     def _delete_stage(self, iterator, tag):
         for parent in iterator:
@@ -39,10 +39,7 @@ class ProcessingAdHoc:
         for item in self._markdownParser.read(iterator, sourcePath):
             if report is not None:
                 itemType = item.__class__.__name__
-                if itemType in report:
-                    report[itemType] += 1
-                else:
-                    report[itemType] = 1
+                report[itemType] = report.get(itemType, 0) + 1
             writer.writelines(
                 output for output in item.outputs(self._job.maxWidth))
     
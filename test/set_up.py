@@ -9,14 +9,27 @@ run with -h switch for usage.
 #
 # Standard library imports, in alphabetic order.
 # 
-# Module for command line switches.
-# Tutorial: https://docs.python.org/3/howto/argparse.html
-# Reference: https://docs.python.org/3/library/argparse.html
-import argparse
+# Module for registering clean up at exit.
+# https://docs.python.org/3/library/atexit.html
+import atexit
 #
-# Module for facilitation of context manager creation.
+# Module for facilitation of context manager creation, and for changing the
+# working directory as a context manager, which is new in Python 3.11.
 # https://docs.python.org/3.5/library/contextlib.html
+# https://docs.python.org/3/library/contextlib.html#contextlib.chdir
 from contextlib import contextmanager
+try:
+    from contextlib import chdir as _chdir
+except ImportError:
+    _chdir = None
+#
+# Module for caching function results.
+# https://docs.python.org/3/library/functools.html#functools.lru_cache
+import functools
+#
+# Module for a counter to generate unique directory names.
+# https://docs.python.org/3/library/itertools.html#itertools.count
+import itertools
 #
 # File path module.
 # https://docs.python.org/3/library/os.path.html
@@ -38,97 +51,172 @@ import sys
 # https://docs.python.org/3/library/tempfile.html
 import tempfile
 #
-# Module for text dedentation.
-# Only used for --help description.
-# https://docs.python.org/3/library/textwrap.html
-import textwrap
-#
 # Local imports
 #
 # Add the location of the Doctor to sys.path so that its `main` module can be
-# imported.
-toolPath = os.path.abspath(os.path.join(
-    os.path.dirname(__file__), os.path.pardir))
-sys.path.append(toolPath)
+# imported. The paths are worked out once, from the absolute path of this file,
+# which is in the test/ directory of the Doctor.
+_testPath = Path(os.path.abspath(__file__)).parent
+toolPath = str(_testPath.parent)
+if toolPath not in sys.path:
+    sys.path.append(toolPath)
 from doctor import main
 #
 # Now add the path for Mistune, so that it can be imported by any test that
-# requires it.
+# requires it. This runs once per interpreter, when set_up is first imported, no
+# matter how many test modules import it or how many times tests are run.
 main.add_mistune_path()
 
-dataPath = os.path.abspath(os.path.join(toolPath, 'test', 'data'))
+dataPath = str(_testPath / 'data')
 
+@functools.lru_cache(maxsize=None)
 def data_path(*basename):
-    '''Get a path within the test data directory.'''
+    '''\
+Get a path within the test data directory. This is the data in the repository,
+not a copy, so it's for tests that only read the data. Tests that modify data
+files should use temporary_data_directory() instead.
+'''
     return os.path.join(dataPath, *basename)
 
 def copy_data(temporaryRoot, addBase=True, ignoring=None):
     '''Copy the test data to a temporary directory.'''
-    if ignoring is None:
-        ignoring = tuple()
-    ignorePatterns = shutil.ignore_patterns(
-        '*_output.*', '*_extract.*', *ignoring)
-    return shutil.copytree(
-        dataPath,
+    destination = (
         os.path.join(temporaryRoot, os.path.basename(dataPath)) if addBase
-        else temporaryRoot,
-        ignore=ignorePatterns)
+        else temporaryRoot)
+    os.makedirs(destination)
+    for path, isDirectory in _data_listing(
+        tuple() if ignoring is None else tuple(ignoring)
+    ):
+        if isDirectory:
+            os.mkdir(os.path.join(destination, path))
+        else:
+            # The copyfile() function uses the fastest copy that the platform
+            # has, for example sendfile() on Linux. Copy-on-write clones aren't
+            # attempted because they only work within a single file system,
+            # and the temporary directory is usually on a different one.
+            shutil.copyfile(
+                os.path.join(dataPath, path), os.path.join(destination, path))
+    return destination
+
+# The test data doesn't change during a run, so it's listed, and the ignore
+# patterns applied, only once for each set of ignore patterns. Copies of the
+# data can't be shared between tests, by hard links for example, because the
+# Doctor overwrites the content of its input files in place.
+@functools.lru_cache(maxsize=None)
+def _data_listing(ignoring):
+    return tuple(_list_tree(dataPath, "", shutil.ignore_patterns(
+        '*_output.*', '*_extract.*', *ignoring)))
+
+def _list_tree(source, relative, ignore):
+    # Generates a relative path, and whether it's a directory, for everything
+    # under the source, parents first. Reads each directory with a single
+    # scandir(), whose entries already know if they're directories.
+    with os.scandir(source) as scanner:
+        entries = tuple(scanner)
+    ignored = ignore(source, [entry.name for entry in entries])
+    for entry in entries:
+        if entry.name in ignored:
+            continue
+        path = os.path.join(relative, entry.name)
+        if entry.is_dir():
+            yield path, True
+            yield from _list_tree(entry.path, path, ignore)
+        else:
+            yield path, False
 
 def _print_paths(label, paths):
+    # The whole list is joined and written in one call, in the same way as
+    # reports are written by the Doctor's main module.
     indent = " " * 2
     if isinstance(paths, str):
-        print("{}:\n{}{}".format(label, indent, paths))
+        sys.stdout.write(f"{label}:\n{indent}{paths}\n")
         return
-    print('{}[{}]:'.format(label, len(paths)))
-    for path in paths:
-        print("{}{}".format(indent, path))
+    sys.stdout.write(''.join((
+        f'{label}[{len(paths)}]:\n',
+        *(f"{indent}{path}\n" for path in paths))))
 
 def copy_files(source, destination, suffix):
-    Path(destination).mkdir(exist_ok=True)
+    os.makedirs(destination, exist_ok=True)
     names = []
-    for path in Path(source).iterdir():
-        # print(path, path.suffix, suffix)
-        if path.suffix == suffix:
-            destinationPath = Path(destination, path.name)
-            shutil.copyfile(str(path), str(destinationPath))
-            names.append(str(destinationPath))
+    # The entries from scandir() are used directly, without a Path object for
+    # each. The suffix is compared the same way as Path.suffix would be. Files
+    # are copied one at a time. The test data files are few and small, so a
+    # thread pool would take longer to start than the copies take.
+    with os.scandir(source) as scanner:
+        for entry in scanner:
+            if os.path.splitext(entry.name)[1] == suffix and entry.is_file():
+                destinationPath = os.path.join(destination, entry.name)
+                shutil.copyfile(entry.path, destinationPath)
+                names.append(destinationPath)
     return names
 
+if _chdir is None:
+    # Same as contextlib.chdir, for Python versions before 3.11.
+    @contextmanager
+    def _chdir(path):
+        cwd = os.getcwd()
+        os.chdir(path)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+# All the temporary directories are made under one directory for the whole test
+# run, which is removed at exit. That saves creating and removing a separate
+# TemporaryDirectory for every test.
+_directoryCounter = itertools.count()
+
+@functools.lru_cache(maxsize=None)
+def _session_directory():
+    path = tempfile.mkdtemp(prefix='doctor_tests_')
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+def _new_directory():
+    path = os.path.join(_session_directory(), f't{next(_directoryCounter)}')
+    os.mkdir(path)
+    return path
+
 @contextmanager
 def temporary_data_directory(**kwargs):
     '''\
 Creates a temporary directory, changes the working directory to it, and creates
 a copy of the test data there, all as a context manager. Accepts keyword
-arguments for the copy_data() subroutine.
+arguments for the copy_data() subroutine. The directory is removed at exit.
 '''
-    cwd = os.getcwd()
-    temporaryDirectory = tempfile.TemporaryDirectory()
-    os.chdir(temporaryDirectory.name)
-    yield copy_data(os.getcwd(), **kwargs)
-    # Note that the previous line calls os.getcwd() again. It doesn't assume
-    # that getcwd() returns the same value that was just passed to chdir(), even
-    # though it's an absolute path. This seems to be required for macOS, which
-    # adds a prefix like "/private/" maybe because this will be running in a
-    # temporary directory.
-    os.chdir(cwd)
-    temporaryDirectory.cleanup()
+    with _chdir(_new_directory()):
+        yield copy_data(os.getcwd(), **kwargs)
+        # Note that the previous line calls os.getcwd() again. It doesn't
+        # assume that getcwd() returns the same value that was just passed to
+        # chdir(), even though it's an absolute path. This seems to be required
+        # for macOS, which adds a prefix like "/private/" maybe because this
+        # will be running in a temporary directory.
 
 @contextmanager
 def temporary_working_directory():
     '''\
 Creates a temporary directory, and changes the working directory to it, as a
-context manager.
+context manager. The directory is removed at exit.
 '''
-    cwd = os.getcwd()
-    temporaryDirectory = tempfile.TemporaryDirectory()
-    os.chdir(temporaryDirectory.name)
-    yield os.getcwd()
-    # See the note in the temporary_data_directory() subroutine, above, for a
-    # discussion of the second call to getcwd().
-    os.chdir(cwd)
-    temporaryDirectory.cleanup()
+    with _chdir(_new_directory()):
+        # See the note in the temporary_data_directory() subroutine, above, for
+        # a discussion of the second call to getcwd().
+        yield os.getcwd()
 
 def main(argv):
+    # Only needed when this file is run as a script, not when it's imported by
+    # a test module.
+    #
+    # Module for command line switches.
+    # Tutorial: https://docs.python.org/3/howto/argparse.html
+    # Reference: https://docs.python.org/3/library/argparse.html
+    import argparse
+    #
+    # Module for text dedentation.
+    # Only used for --help description.
+    # https://docs.python.org/3/library/textwrap.html
+    import textwrap
+
     argumentParser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description=textwrap.dedent(__doc__), epilog=r"""
@@ -11,6 +11,10 @@ Run just these tests like:
 #
 # Standard library imports, in alphabetic order.
 #
+# Module for redirecting the standard error stream.
+# https://docs.python.org/3/library/contextlib.html#contextlib.redirect_stderr
+from contextlib import redirect_stderr
+#
 # Stream tools module
 # https://docs.python.org/3/library/io.html#io.StringIO
 from io import StringIO
@@ -37,39 +41,43 @@ import unittest
 # imported.
 toolPath = os.path.abspath(os.path.join(
     os.path.dirname(__file__), os.path.pardir))
-sys.path.append(toolPath)
+if toolPath not in sys.path:
+    sys.path.append(toolPath)
 from doctor import main
 
 class TestMistunePath(unittest.TestCase):
     def capture_add_mistune_path(self, path, addFile=False):
-        captureStream = StringIO()
-
-        sys.stderr = captureStream
-        main.add_mistune_path(path)
-        sys.stderr = sys.__stderr__
-
-        captured = captureStream.getvalue()
-        captureStream.close()
+        # The redirection restores whatever sys.stderr was before, even if
+        # there's an exception, and even if it wasn't sys.__stderr__.
+        with StringIO() as captureStream:
+            with redirect_stderr(captureStream):
+                main.add_mistune_path(path)
+            captured = captureStream.getvalue()
         
         expectedPath = path if os.path.isabs(path) else os.path.abspath(path)
         if addFile:
             expectedPath = os.path.join(expectedPath, "mistune.py")
         expected = '"{}"'.format(expectedPath)
-        message = str({"expected": expected, "captured": captured})
-        self.assertTrue(expected in captured, message)
+        self.assertIn(expected, captured)
         self.assertTrue(captured.startswith("Warning:"), captured)
         self.assertTrue(captured.endswith("\n"), captured)
         return captured
        
     def test_add_mistune_path(self):
         captured = self.capture_add_mistune_path('/duff/absolute/path')
-        self.assertTrue("isn't a directory" in captured, captured)
+        self.assertIn("isn't a directory", captured)
         
         captured = self.capture_add_mistune_path('duff/relative/path')
-        self.assertTrue("isn't a directory" in captured, captured)
+        self.assertIn("isn't a directory", captured)
         
         captured = self.capture_add_mistune_path(os.path.curdir, True)
-        self.assertTrue("doesn't include expected file" in captured, captured)
+        self.assertIn("doesn't include expected file", captured)
+
+    def test_add_mistune_path_once(self):
+        path = '/duff/repeated/path'
+        self.capture_add_mistune_path(path)
+        self.capture_add_mistune_path(path)
+        self.assertEqual(sys.path.count(path), 1)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,46 @@
+# Run with Python 3
+# Copyright 2024 Omnissa, LLC.
+# SPDX-License-Identifier: BSD-2-Clause
+"""\
+Unit tests for the mistree module in the Doctor tool.
+
+Run just these tests like:
+
+    python3 test/test_mistree.py
+"""
+#
+# Standard library imports, in alphabetic order.
+#
+# Regular expressions module.
+# https://docs.python.org/3/library/re.html
+import re
+#
+# Unit test framework.
+# https://docs.python.org/3/library/unittest.html
+import unittest
+#
+# Local imports
+#
+# Handy common code to put the Doctor module on the import path.
+import set_up
+#
+# Module under test.
+from doctor.mistree import matched_groups
+
+class TestMatchedGroups(unittest.TestCase):
+    def test_start_order(self):
+        # Test that groups are in definition order when that's the start order.
+        pattern = re.compile(r'(?P<a>x)(?P<b>y)?(?P<c>z)')
+        self.assertEqual(matched_groups(pattern.match("xyz")), ['a', 'b', 'c'])
+        self.assertEqual(matched_groups(pattern.match("xz")), ['a', 'c'])
+        #
+        # Test that groups in a repeated group are in start order, which isn't
+        # their definition order here.
+        pattern = re.compile(r'(?:(?P<a>x)|(?P<b>y))+')
+        self.assertEqual(matched_groups(pattern.match("yx")), ['b', 'a'])
+        #
+        # Test that no match gives an empty list.
+        self.assertEqual(matched_groups(pattern.match("z")), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Run with Python 3
+# Copyright 2024 Omnissa, LLC.
+# SPDX-License-Identifier: BSD-2-Clause
+"""\
+Unit tests for the output_tree module in the Doctor tool.
+
+Run just these tests like:
+
+    python3 test/test_output_tree.py
+"""
+#
+# Standard library imports, in alphabetic order.
+#
+# Unit test framework.
+# https://docs.python.org/3/library/unittest.html
+import unittest
+#
+# Module for XML handling.
+# https://docs.python.org/3.5/library/xml.etree.elementtree.html#module-xml.etree.ElementTree
+import xml.etree.ElementTree as ET
+#
+# Local imports
+#
+# Handy common code to put the Doctor module on the import path.
+import set_up
+#
+# Class under test.
+from doctor.output_tree import OutputTree
+
+class TestOutputTree(unittest.TestCase):
+    def text_output(self, text):
+        comment = ET.Element('comment')
+        ET.SubElement(
+            ET.SubElement(comment, 'markdown'), 'text', {'layout': 'span'}
+        ).text = text
+        for element in OutputTree().markdown_outputs((comment,)):
+            return element.find('outputs')[0].text
+
+    def test_whitespace_collapse(self):
+        # Test that runs of whitespace, including line breaks, collapse to a
+        # single space.
+        self.assertEqual(
+            self.text_output("one  two\r\nthree\n"), "one two three ")
+        self.assertEqual(self.text_output("one\t \ntwo"), "one two")
+        #
+        # Test that leading whitespace is kept as a single space.
+        self.assertEqual(self.text_output("\n  lead"), " lead")
+        #
+        # Test that whitespace only collapses to a single space, and that empty
+        # text stays empty.
+        self.assertEqual(self.text_output(" \r\n "), " ")
+        self.assertEqual(self.text_output(""), "")
+        #
+        # Test that text with no whitespace runs is unchanged.
+        self.assertEqual(self.text_output("plain text"), "plain text")
+
+if __name__ == '__main__':
+    unittest.main()
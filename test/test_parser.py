@@ -25,86 +25,104 @@ from doctor.parser import SlashStarsParser
 from doctor.comment_line import match_groups, match_spans
 
 class TestParser(unittest.TestCase):
-    def test_continuation_RE(self):
-        parser = SlashStarsParser()
+    # The parser has no state, so one instance is shared by all the tests.
+    @classmethod
+    def setUpClass(cls):
+        cls.parser = SlashStarsParser()
 
+    def test_continuation_RE(self):
         # Test empty string.
-        match = parser.commentContinue.search("")
+        match = self.parser.commentContinue.match("")
         self.assertEqual(match_spans(match), ("", "", ""))
         self.assertDictEqual(match_groups(match), {'indent': '', 'EOL': ''})
 
         # Test comment without symbol nor indent.
         input = 'flush comment\n'
-        match = parser.commentContinue.search(input)
+        match = self.parser.commentContinue.match(input)
         self.assertEqual(match_spans(match), ("", "", input))
         self.assertDictEqual(match_groups(match), {
             'indent': '', 'nonSymbol': ''
         })
         
         # Test indent and comment without symbol.
-        match = parser.commentContinue.search("  code\n")
+        match = self.parser.commentContinue.match("  code\n")
         self.assertEqual(match_spans(match), ("", "  ", "code\n"))
         self.assertDictEqual(match_groups(match), {
             'indent': '  ', 'nonSymbol': ''
         })
 
         # Test space before newline is parsed as a margin.
-        match = parser.commentContinue.search("  * \n")
+        match = self.parser.commentContinue.match("  * \n")
         self.assertEqual(match_spans(match), ("", "  * ", "\n"))
         self.assertDictEqual(match_groups(match), {
             'indent': '  ', 'symbolMargin': '*', 'margin': ' '
         })
         
         # Test symbol, then immediate newline.
-        match = parser.commentContinue.search("  *\n")
+        match = self.parser.commentContinue.match("  *\n")
         self.assertEqual(match_spans(match), ("", "  *", "\n"))
         self.assertDictEqual(match_groups(match), {
             'indent': '  ', 'symbolEOL': '*',
         })
         
         # Test end comment isn't matched.
-        match = parser.commentContinue.search("  */\n")
+        match = self.parser.commentContinue.match("  */\n")
         self.assertIsNone(match)
 
         # Test symbol, then immediate comment text.
-        match = parser.commentContinue.search("  *g\n")
+        match = self.parser.commentContinue.match("  *g\n")
         self.assertEqual(match_spans(match), ("", "  *", "g\n"))
         self.assertDictEqual(match_groups(match), {
             'indent': '  ', 'symbolNonSlash': '*',
         })
         
         # Test symbol, then space, then comment text is parsed as a margin.
-        match = parser.commentContinue.search("  * b\n")
+        match = self.parser.commentContinue.match("  * b\n")
         self.assertEqual(match_spans(match), ("", "  * ", "b\n"))
         self.assertDictEqual(match_groups(match), {
             'indent': '  ', 'symbolMargin': '*', 'margin': ' '
         })
         
         # Test indent on its own.
-        match = parser.commentContinue.search("      ")
+        match = self.parser.commentContinue.match("      ")
         self.assertEqual(match_spans(match), ("", "      ", ""))
         self.assertDictEqual(match_groups(match), {
             'indent': "      ", 'EOL': ""
         })
         
-    def test_finishing_RE(self):
-        parser = SlashStarsParser()
+    def test_starting_RE(self):
+        # Test indented start comment with margin.
+        match = self.parser.commentStart.match("  /** b\n")
+        self.assertEqual(match_spans(match), ("", "  /** ", "b\n"))
+        self.assertDictEqual(match_groups(match), {
+            'indent': "  ", 'symbol': "/**", 'margin': " "
+        })
 
+        # Test start comment after code isn't matched, because match() anchors
+        # at the start of the line.
+        match = self.parser.commentStart.match("int x; /** b\n")
+        self.assertIsNone(match)
+
+        # Test empty comment isn't matched.
+        match = self.parser.commentStart.match("/**/\n")
+        self.assertIsNone(match)
+
+    def test_finishing_RE(self):
         # Test bare end comment.
-        match = parser.commentFinish.search("*/")
+        match = self.parser.commentFinish.search("*/")
         self.assertEqual(match_spans(match), ("", "*/", ""))
         self.assertDictEqual(match_groups(match), {
             'indent': "", 'symbol': "*/"
         })
 
-        match = parser.commentFinish.search("end space */")
+        match = self.parser.commentFinish.search("end space */")
         self.assertEqual(match_spans(match), ("end space ", "*/", ""))
         self.assertDictEqual(match_groups(match), {'symbol': "*/"})
 
-        match = parser.commentFinish.search("not end")
+        match = self.parser.commentFinish.search("not end")
         self.assertIsNone(match)
 
-        match = parser.commentFinish.search("      */")
+        match = self.parser.commentFinish.search("      */")
         self.assertEqual(match_spans(match), ("", "      */", ""))
         self.assertDictEqual(match_groups(match), {
             'indent': "      ", 'symbol': "*/"